@@ -12,8 +12,18 @@ from ..os.oper import path_open
 
 
 def set_none(df, other=None, **kwargs):
-    '''将nan替换为None, 可以应用于series'''
-    return df.where(pd.notnull(df), other=other, **kwargs)
+    '''将nan替换为None, 可以应用于series. 新版pandas的where不会把float列变成object, None会再变回nan,
+    有nan的列先转成object, 其他列保持原dtype'''
+    notnull = pd.notnull(df)
+    if other is None:
+        if isinstance(df, pd.Series):
+            if not notnull.all():
+                df = df.astype(object)
+        else:
+            cols = notnull.columns[~notnull.all()]
+            if len(cols):
+                df = df.astype({c: object for c in cols})
+    return df.where(notnull, other=other, **kwargs)
 
 
 def drop_nan(df, col):
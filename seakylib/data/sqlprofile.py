@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 14:00
+
+'''
+MyModel的语句级profile, 默认关闭.
+prof = SqlProfile('table')
+with prof:
+    with phase('diff'):
+        ...
+prof.summary() -> {'phases': {'diff': 0.1}, 'statements': {fingerprint: {count, time, rows, bytes}}, 'slow': [...]}
+'''
+
+import json
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 当前生效的SqlProfile, 没有时hook不做任何事
+CURRENT = ContextVar('seakylib_sql_profile', default=None)
+# latency buckets of histogram, ms
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+# {tablename: Histogram}
+HISTOGRAMS = {}
+
+RE_FINGERPRINT = [
+    (re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\''), '?'),
+    (re.compile(r'(?<![\w`])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.I), '?'),
+    (re.compile(r'%\(\w+\)s|%s|:\w+'), '?'),
+    (re.compile(r'(?<!is )(?<!not )\bnull\b', re.I), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?+)'),
+    (re.compile(r'(?:\(\?\+\)\s*,\s*)+\(\?\+\)'), '(?+)+'),
+    (re.compile(r'(?:WHEN \? THEN \?\s*)+', re.I), 'WHEN ? THEN ? ... '),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def fingerprint(sql):
+    '''
+    strip literals and collapse value lists, so that statements of the same shape have the same fingerprint
+    :param sql:
+    :return:
+    '''
+    for pat, repl in RE_FINGERPRINT:
+        sql = pat.sub(repl, sql)
+    return sql.strip()
+
+
+def params_size(parameters, executemany=False):
+    '''
+    approximate bytes of parameters
+    '''
+    if not parameters:
+        return 0
+    rows = parameters if executemany else [parameters]
+    size = 0
+    for row in rows:
+        values = row.values() if isinstance(row, dict) else row
+        size += sum(len(str(v)) for v in values)
+    return size
+
+
+@contextmanager
+def phase(name):
+    '''
+    add elapsed time to the phase of current profile, nothing happens if no profile is active
+    :param name:
+    :return:
+    '''
+    prof = CURRENT.get()
+    if prof is None:
+        yield
+        return
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        prof.phases[name] = round(prof.phases.get(name, 0) + time.time() - start_time, 6)
+
+
+class Histogram:
+    '''
+    rolling latency histogram of the latest maxlen statements of a model
+    '''
+
+    def __init__(self, name, maxlen=10000):
+        self.name = name
+        self.records = deque(maxlen=maxlen)
+
+    def add(self, fp, elapsed, rows):
+        self.records.append((fp, elapsed, rows))
+
+    def to_dict(self):
+        d = OrderedDict([('name', self.name), ('statements', len(self.records)), ('by_fingerprint', {})])
+        for fp, elapsed, rows in self.records:
+            if fp not in d['by_fingerprint']:
+                d['by_fingerprint'][fp] = {'count': 0, 'time': 0, 'rows': 0,
+                                           'buckets': OrderedDict(('<={}ms'.format(x), 0) for x in BUCKETS + ['inf'])}
+            x = d['by_fingerprint'][fp]
+            x['count'] += 1
+            x['time'] = round(x['time'] + elapsed, 6)
+            x['rows'] += max(rows, 0)
+            ms = elapsed * 1000
+            for b in BUCKETS:
+                if ms <= b:
+                    x['buckets']['<={}ms'.format(b)] += 1
+                    break
+            else:
+                x['buckets']['<=infms'] += 1
+        return d
+
+
+def get_histogram(name):
+    if name not in HISTOGRAMS:
+        HISTOGRAMS[name] = Histogram(name)
+    return HISTOGRAMS[name]
+
+
+def dump_histograms(path=None, names=None):
+    '''
+    :param path:    json file, return the dict if None
+    :param names:   tablenames, all by default
+    :return:
+    '''
+    d = {k: v.to_dict() for k, v in HISTOGRAMS.items() if not names or k in names}
+    if path:
+        with open(path, 'w') as f:
+            json.dump(d, f, indent=2, default=str)
+    return d
+
+
+class SqlProfile:
+    '''
+    statements executed in `with prof:` are recorded, the statements are also added to the histogram of name
+    '''
+
+    def __init__(self, name=None, slow=10):
+        '''
+        :param name:    tablename, None for no histogram
+        :param slow:    keep the slowest n statements
+        '''
+        self.name = name
+        self.slow = slow
+        self.phases = OrderedDict()
+        self.statements = []
+        self.start_time = None
+        self.token = None
+
+    def __enter__(self):
+        self.start_time = time.time()
+        self.token = CURRENT.set(self)
+        return self
+
+    def __exit__(self, *args):
+        CURRENT.reset(self.token)
+        self.phases['total'] = round(time.time() - self.start_time, 6)
+
+    def record(self, statement, elapsed, rowcount, size):
+        fp = fingerprint(statement)
+        self.statements.append({'fingerprint': fp, 'time': round(elapsed, 6), 'rows': rowcount, 'bytes': size,
+                                'sql': statement[:200]})
+        if self.name:
+            get_histogram(self.name).add(fp, elapsed, rowcount)
+
+    def summary(self):
+        d = OrderedDict()
+        for x in self.statements:
+            if x['fingerprint'] not in d:
+                d[x['fingerprint']] = {'count': 0, 'time': 0, 'rows': 0, 'bytes': 0}
+            y = d[x['fingerprint']]
+            y['count'] += 1
+            y['time'] = round(y['time'] + x['time'], 6)
+            y['rows'] += max(x['rows'], 0)
+            y['bytes'] += x['bytes']
+        return OrderedDict([('phases', self.phases),
+                            ('sql_count', len(self.statements)),
+                            ('sql_time', round(sum(x['time'] for x in self.statements), 6)),
+                            ('statements', d),
+                            ('slow', sorted(self.statements, key=lambda x: -x['time'])[:self.slow])])
+
+
+def add_profiler(_engine=Engine):
+    '''
+    before/after_cursor_execute hooks, statements are recorded only when a SqlProfile is active
+    :param _engine: Engine class by default, so sessions created outside of the registry are covered too
+    :return:
+    '''
+
+    @event.listens_for(_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if CURRENT.get() is not None:
+            conn.info.setdefault('profile_start', []).append(time.time())
+
+    @event.listens_for(_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        prof = CURRENT.get()
+        if prof is None or not conn.info.get('profile_start'):
+            return
+        elapsed = time.time() - conn.info['profile_start'].pop()
+        prof.record(statement, elapsed, cursor.rowcount,
+                    len(statement.encode()) + params_size(parameters, executemany))
+
+    return _engine
+
+
+add_profiler()
@@ -3,25 +3,40 @@
 # @Author: Seaky
 # @Date:   2019/4/20 14:44
 
+import asyncio
+import hashlib
+import json
 import queue
+import threading
 import time
 import traceback
-from collections import OrderedDict
-from multiprocessing import Process, Manager
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import count
+from multiprocessing import Process, Pipe
+from multiprocessing.connection import wait
 from random import randint
 
 from ..data.mysql import MyModel
-from ..data.mysql import new_session
+from ..data.mysql import new_session, engine_stats, retry_stats
 from ..func.base import MyClass, catch_exception
 from ..func.parser import ArgParseClass
 from ..os.info import get_caller
 from ..os.oper import dump_data, load_data
 
 
+def job_hash(kw):
+    '''
+    stable hash of a job's kw, used as the key of journal
+    '''
+    return hashlib.sha1(json.dumps(kw, sort_keys=True, default=str).encode()).hexdigest()
+
+
 class MultiRun(MyClass):
     def __init__(self, func, func_kws, process_num=5, func_common_kw=None, func_common_kw_with_obj=None,
                  process_db_session_enable=False, process_db_session_kw=None, show_process=False, show_job_result=False,
-                 mark_start_time=False, add_log_to_common_kw=True, **kwargs):
+                 mark_start_time=False, add_log_to_common_kw=True, chunksize=None, backend='process', **kwargs):
         '''
         :param func: 处理函数，需要返回 status, result
         :param func_kws:    需要处理的参数
@@ -35,6 +50,10 @@ class MultiRun(MyClass):
         :param show_job_result: 显示每个job的result
         :param mark_start_time: 给job传入start_time以统计时间
         :param add_log_to_common_kw:
+        :param chunksize:   每次通过pipe发给进程的job数, 默认 min(100, jobs / process_num / 4)
+        :param backend: 'process': fork进程, 'thread': 线程池, 适合网络io的func,
+            'asyncio': event loop, func可以是coroutine function(普通函数在线程中运行), process_num为并发数(semaphore).
+            process_db_session对process/thread的每个worker生效
         :return
         '''
         MyClass.__init__(self, **kwargs)
@@ -49,7 +68,10 @@ class MultiRun(MyClass):
         self.control['show_process'] = show_process
         self.control['show_job_result'] = show_job_result
         self.control['mark_start_time'] = mark_start_time
-        self.stat = {'miss': 0, 'success': 0, 'fail': 0, 'total': len(self.func_kws), 'timer': {}}
+        self.control['chunksize'] = chunksize
+        assert backend in ['process', 'thread', 'asyncio'], 'backend {} is not supported.'.format(backend)
+        self.control['backend'] = backend
+        self.stat = {'miss': 0, 'success': 0, 'fail': 0, 'timeout': 0, 'total': len(self.func_kws), 'timer': {}}
         if add_log_to_common_kw and 'log' not in self.func_common_kw_with_obj:
             self.func_common_kw_with_obj['log'] = self.log
         self.cache['timer_retry'] = []
@@ -57,59 +79,369 @@ class MultiRun(MyClass):
     def before_run(self):
         self.func_kws_now = self.func_kws
 
-    def job(self, process_i, inline=False):
-        self.show_process_debug('process {} start.'.format(process_i))
+    def db_session_start(self, process_i):
         if self.default('process_db_session_enable') and self.default('process_db_session_kw'):
             db_session = new_session(**self.default('process_db_session_kw'))
             self.show_process_debug('process {} create data session {}.'.format(process_i, db_session))
-        else:
-            db_session = None
-        i = 0
-        while True:
-            try:
-                start_time = time.time()
-                if not inline:
-                    v = self.q_input.get_nowait()
-                else:
-                    v = self.q_input[i]
-                    i += 1
-                self.show_process_debug('process {} get {} job, kwarg: {}'.format(process_i, v['order_in'], v['kw']))
-                if db_session:
-                    self.func_common_kw_with_obj.update({'db_session': db_session})
-                st = {'start_time': start_time} if self.default('mark_start_time') else {}
-                self.timer[v['idx']] = start_time
-                try:
-                    is_ok, result = self.func(**v['kw'], **self.func_common_kw_with_obj, **st)
-                except Exception as e:
-                    self.log.info(traceback.format_exc())
-                    is_ok, result = False, str(e)
-                elapsed_time = round(time.time() - start_time, 2)
-                v.update({'is_ok': is_ok, 'result': result, 'timer': elapsed_time})
-                if self.default('show_job_result'):
-                    _log = self.log.info if is_ok else self.log.error
-                    _log('{} | time: {}'.format(result, elapsed_time))
-                self.show_process_debug('process {} do {} job done. result: {}'.format(process_i, v['order_in'],
-                                                                                       {'is_ok': is_ok,
-                                                                                        'result': result}))
-                if not inline:
-                    self.q_output.put(v)
-                else:
-                    self.q_output.append(v)
-
-            except queue.Empty:
-                break
-            except IndexError:
-                break
-            except Exception as e:
-                self.log.info(traceback.format_exc())
-                break
+            return db_session
+
+    def db_session_end(self, process_i, db_session):
         if db_session:
             db_session.close()
+            self.show_process_debug('process {} pool stats {}, sql errors {}.'.format(process_i, engine_stats(),
+                                                                                      retry_stats()))
+
+    def job_kwargs(self, process_i, v, start_time, db_session=None):
+        self.show_process_debug('process {} get {} job, kwarg: {}'.format(process_i, v['order_in'], v['kw']))
+        kw = dict(v['kw'], **self.func_common_kw_with_obj)
+        if db_session:
+            kw['db_session'] = db_session
+        if self.default('mark_start_time'):
+            kw['start_time'] = start_time
+        return kw
+
+    def run_job(self, process_i, v, db_session=None):
+        '''
+        运行一个job, 计时在本地完成
+        :param process_i:
+        :param v:   {'order_in': , 'idx': , 'kw': }
+        :param db_session:
+        :return:    is_ok, result, elapsed_time
+        '''
+        start_time = time.time()
+        try:
+            is_ok, result = self.func(**self.job_kwargs(process_i, v, start_time, db_session))
+        except Exception as e:
+            self.log.info(traceback.format_exc())
+            is_ok, result = False, str(e)
+        return self.job_done(process_i, v, is_ok, result, start_time)
+
+    async def run_job_async(self, process_i, v):
+        '''
+        asyncio backend的job, 普通函数在默认的线程池中运行
+        '''
+        start_time = time.time()
+        try:
+            kw = self.job_kwargs(process_i, v, start_time)
+            if asyncio.iscoroutinefunction(self.func):
+                is_ok, result = await self.func(**kw)
+            else:
+                is_ok, result = await asyncio.get_running_loop().run_in_executor(None, partial(self.func, **kw))
+        except Exception as e:
+            self.log.info(traceback.format_exc())
+            is_ok, result = False, str(e)
+        return self.job_done(process_i, v, is_ok, result, start_time)
+
+    def job_done(self, process_i, v, is_ok, result, start_time):
+        elapsed_time = round(time.time() - start_time, 2)
+        if self.default('show_job_result'):
+            _log = self.log.info if is_ok else self.log.error
+            _log('{} | time: {}'.format(result, elapsed_time))
+        self.show_process_debug('process {} do {} job done. result: {}'.format(process_i, v['order_in'],
+                                                                               {'is_ok': is_ok, 'result': result}))
+        return is_ok, result, elapsed_time
+
+    def job(self, process_i, conn):
+        '''
+        worker进程, 从pipe接收一批job, 每个job完成后发回 (idx, is_ok, result, timer), 收到None时退出
+        :param process_i:
+        :param conn:
+        :return:
+        '''
+        self.show_process_debug('process {} start.'.format(process_i))
+        db_session = self.db_session_start(process_i)
+        try:
+            while True:
+                try:
+                    chunk = conn.recv()
+                except EOFError:
+                    break
+                if chunk is None:
+                    break
+                for v in chunk:
+                    is_ok, result, elapsed_time = self.run_job(process_i, v, db_session)
+                    try:
+                        conn.send((v['idx'], is_ok, result, elapsed_time))
+                    except (TypeError, AttributeError, ValueError) as e:
+                        # result can not be pickled
+                        conn.send((v['idx'], False, 'result can not be sent. {}'.format(e), elapsed_time))
+        except Exception as e:
+            self.log.info(traceback.format_exc())
+        finally:
+            self.db_session_end(process_i, db_session)
+            conn.close()
         self.show_process_debug('process {} end.'.format(process_i))
 
+    def dispatch_inline(self, jobs):
+        db_session = self.db_session_start(1)
+        try:
+            for v in jobs:
+                self.timer[v['idx']] = time.time()
+                is_ok, result, elapsed_time = self.run_job(1, v, db_session)
+                v.update({'is_ok': is_ok, 'result': result, 'timer': elapsed_time})
+                yield v
+        finally:
+            self.db_session_end(1, db_session)
+
+    def job_timed_out(self, v, job_timeout):
+        '''
+        job超时的结果
+        '''
+        elapsed_time = round(time.time() - self.timer[v['idx']], 2)
+        v.update({'is_ok': False, 'timeout': True, 'result': 'job timeout after {}s.'.format(job_timeout),
+                  'timer': elapsed_time})
+        self.log_error('job timeout. {}'.format(v['kw']))
+        return v
+
+    def dispatch_thread(self, jobs, process_timeout=None, job_timeout=None):
+        '''
+        process_num个线程从queue取job, 结果放入queue.
+        线程无法被结束, job超时时放弃该线程(其结果被丢弃)并启动新线程; 总超时后未完成的job为miss
+        :param jobs:
+        :param process_timeout:
+        :param job_timeout:
+        :return:    generator of finished jobs
+        '''
+        process_num = min(self.default('process_num'), len(jobs))
+        self.cache['process_num_use'] = process_num
+        q_input, q_output = queue.Queue(), queue.Queue()
+        for v in jobs:
+            q_input.put(v)
+        stop = threading.Event()
+        lock = threading.Lock()
+        # {thread_i: job}
+        running = {}
+        # {thread_i: abandon event}
+        workers = {}
+
+        def worker(thread_i, abandon):
+            self.show_process_debug('thread {} start.'.format(thread_i))
+            db_session = self.db_session_start(thread_i)
+            try:
+                while not stop.is_set():
+                    try:
+                        v = q_input.get_nowait()
+                    except queue.Empty:
+                        break
+                    with lock:
+                        self.timer[v['idx']] = time.time()
+                        running[thread_i] = v
+                    is_ok, result, elapsed_time = self.run_job(thread_i, v, db_session)
+                    with lock:
+                        running.pop(thread_i, None)
+                        if abandon.is_set():
+                            break
+                    v.update({'is_ok': is_ok, 'result': result, 'timer': elapsed_time})
+                    q_output.put((thread_i, v))
+            finally:
+                self.db_session_end(thread_i, db_session)
+                q_output.put((thread_i, None))
+            self.show_process_debug('thread {} end.'.format(thread_i))
+
+        ids = count(1)
+
+        def spawn():
+            thread_i = next(ids)
+            workers[thread_i] = threading.Event()
+            threading.Thread(target=worker, args=(thread_i, workers[thread_i]), daemon=True).start()
+
+        for _ in range(process_num):
+            spawn()
+        deadline = time.time() + process_timeout if process_timeout else None
+        try:
+            while workers:
+                timeouts = [deadline] if deadline else []
+                if job_timeout:
+                    with lock:
+                        timeouts += [self.timer[v['idx']] + job_timeout for v in running.values()]
+                try:
+                    thread_i, v = q_output.get(timeout=max(min(timeouts) - time.time(), 0) if timeouts else None)
+                except queue.Empty:
+                    if deadline and time.time() >= deadline:
+                        break
+                    with lock:
+                        expired = [(i, v) for i, v in running.items() if i in workers and
+                                   time.time() - self.timer[v['idx']] >= job_timeout]
+                        for i, v in expired:
+                            running.pop(i)
+                            workers.pop(i).set()
+                    for i, v in expired:
+                        self.show_process_debug('abandon thread {}.'.format(i))
+                        yield self.job_timed_out(v, job_timeout)
+                        if not q_input.empty():
+                            spawn()
+                    continue
+                if v is None:
+                    workers.pop(thread_i, None)
+                elif thread_i in workers:
+                    yield v
+        finally:
+            stop.set()
+
+    def dispatch_asyncio(self, jobs, process_timeout=None, job_timeout=None):
+        '''
+        event loop在单独的线程中运行, 并发数由semaphore(process_num)限制, 结果放入queue.
+        job超时时cancel, 同步函数在线程中无法被结束, 只是放弃其结果
+        :param jobs:
+        :param process_timeout:
+        :param job_timeout:
+        :return:    generator of finished jobs
+        '''
+        self.cache['process_num_use'] = min(self.default('process_num'), len(jobs))
+        q_output = queue.Queue()
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(self.default('process_num'))
+        loop.set_default_executor(executor)
+
+        async def main():
+            sem = asyncio.Semaphore(self.default('process_num'))
+
+            async def one(v):
+                async with sem:
+                    self.timer[v['idx']] = time.time()
+                    try:
+                        is_ok, result, elapsed_time = await asyncio.wait_for(self.run_job_async(1, v), job_timeout)
+                    except asyncio.TimeoutError:
+                        q_output.put(self.job_timed_out(v, job_timeout))
+                        return
+                    v.update({'is_ok': is_ok, 'result': result, 'timer': elapsed_time})
+                    q_output.put(v)
+            try:
+                await asyncio.gather(*[one(v) for v in jobs])
+            finally:
+                q_output.put(None)
+
+        def run_loop():
+            try:
+                loop.run_until_complete(main())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                loop.close()
+                executor.shutdown(wait=False)
+
+        def cancel():
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(lambda: [t.cancel() for t in asyncio.all_tasks(loop)])
+
+        thread = threading.Thread(target=run_loop, daemon=True)
+        thread.start()
+        yield from self.drain(q_output, 1, process_timeout, cancel)
+
+    def drain(self, q_output, workers, process_timeout=None, stop=None):
+        '''
+        从q_output取结果, 直到收到workers个None或超时
+        :param q_output:
+        :param workers:
+        :param process_timeout: 总时间
+        :param stop:    超时或提前结束时调用
+        :return:
+        '''
+        deadline = time.time() + process_timeout if process_timeout else None
+        try:
+            while workers:
+                try:
+                    v = q_output.get(timeout=max(deadline - time.time(), 0) if deadline else None)
+                except queue.Empty:
+                    break
+                if v is None:
+                    workers -= 1
+                else:
+                    yield v
+        finally:
+            if stop:
+                stop()
+
+    def dispatch_process(self, jobs, process_timeout=None, job_timeout=None):
+        '''
+        job按chunksize分批通过pipe发给进程, 进程的job全部返回后再发下一批, 没有job时发送None.
+        进程退出时未返回的job为miss. process_timeout是所有进程的总时间.
+        job超过job_timeout时结束该进程, 这个job为timeout, 这一批中其他未完成的job放回队列, 再启动一个新进程
+        :param jobs:
+        :param process_timeout:
+        :param job_timeout:
+        :return:    generator of finished jobs
+        '''
+        process_num = min(self.default('process_num'), len(jobs))
+        self.cache['process_num_use'] = process_num
+        chunksize = self.default('chunksize') or max(1, min(100, len(jobs) // (process_num * 4)))
+        self.show_debug('start {} process, chunksize {}.'.format(process_num, chunksize))
+        pending = deque(jobs)
+        workers = OrderedDict()
+
+        def send_chunk(conn):
+            w = workers[conn]
+            if not pending:
+                conn.send(None)
+                return False
+            chunk = [pending.popleft() for _ in range(min(chunksize, len(pending)))]
+            w['jobs'].extend(chunk)
+            self.timer[chunk[0]['idx']] = time.time()
+            conn.send(chunk)
+            return True
+
+        def spawn(process_i):
+            conn, child = Pipe()
+            process = Process(target=self.job, args=(process_i, child))
+            process.start()
+            child.close()
+            workers[conn] = {'i': process_i, 'process': process, 'jobs': deque()}
+            if not send_chunk(conn):
+                close(conn)
+
+        def close(conn, terminate=False):
+            w = workers.pop(conn)
+            if terminate and w['process'].is_alive():
+                self.show_process_debug('terminate process {}.'.format(w['i']))
+                w['process'].terminate()
+            w['process'].join()
+            conn.close()
+
+        for process_i in range(1, process_num + 1):
+            spawn(process_i)
+        deadline = time.time() + process_timeout if process_timeout else None
+        try:
+            while workers:
+                timeouts = [deadline] if deadline else []
+                if job_timeout:
+                    timeouts += [self.timer[w['jobs'][0]['idx']] + job_timeout for w in workers.values() if w['jobs']]
+                ready = wait(list(workers), timeout=max(min(timeouts) - time.time(), 0) if timeouts else None)
+                if deadline and time.time() >= deadline:
+                    break
+                for conn in ready:
+                    w = workers[conn]
+                    try:
+                        idx, is_ok, result, elapsed_time = conn.recv()
+                    except EOFError:
+                        self.show_process_debug('process {} exited with {} jobs left.'.format(w['i'], len(w['jobs'])))
+                        close(conn)
+                        continue
+                    v = w['jobs'].popleft()
+                    v.update({'is_ok': is_ok, 'result': result, 'timer': elapsed_time})
+                    yield v
+                    if w['jobs']:
+                        self.timer[w['jobs'][0]['idx']] = time.time()
+                    elif not send_chunk(conn):
+                        close(conn)
+                if not job_timeout:
+                    continue
+                for conn, w in list(workers.items()):
+                    if not w['jobs'] or time.time() - self.timer[w['jobs'][0]['idx']] < job_timeout:
+                        continue
+                    v = w['jobs'].popleft()
+                    pending.extendleft(reversed(w['jobs']))
+                    close(conn, terminate=True)
+                    yield self.job_timed_out(v, job_timeout)
+                    if pending:
+                        spawn(w['i'])
+        finally:
+            for conn in list(workers):
+                close(conn, terminate=True)
+
     @catch_exception()
     def run(self, mrun_load=False, mrun_save=True, retry_fail=0, func_retry_skip=None, func_change=None,
-            load_fail_result=False, show_stats=True, inline=False, process_timeout=None, *args, **kwargs):
+            load_fail_result=False, show_stats=True, inline=False, process_timeout=None, job_timeout=None,
+            stream=False, batch=None, journal=None, resume=False, *args, **kwargs):
         '''
         :param mrun_load:
         :param mrun_save:
@@ -119,84 +451,195 @@ class MultiRun(MyClass):
         :param load_fail_result:   --load_fail_result
         :param show_stats:   显示概要
         :param inline:    非多进程
-        :param process_timeout:   进程超时
+        :param process_timeout:   总时间, 超时后未完成的job为miss
+        :param job_timeout:   单个job的超时, 只结束卡住的worker, 该job的结果为timeout, 其他job继续. inline时不生效
+        :param stream:  返回 True, generator, 见iter_results
+        :param batch:   stream时每次yield的结果数
+        :param journal: 每个结果完成后追加到 {caller}_mrun_journal.jsonl, 默认同mrun_save
+        :param resume:  跳过journal中已成功的kw(按job_hash), 只运行其余的, 结果中包含已成功的结果
         :param args:
         :param kwargs:
         :return:
         '''
+        it = self.iter_results(mrun_load=mrun_load, mrun_save=mrun_save, retry_fail=retry_fail,
+                               func_retry_skip=func_retry_skip, func_change=func_change,
+                               load_fail_result=load_fail_result, show_stats=show_stats, inline=inline,
+                               process_timeout=process_timeout, job_timeout=job_timeout, batch=batch,
+                               journal=journal, resume=resume, keep=True)
+        if stream:
+            return True, it
+        for _ in it:
+            pass
+        return True, self.results
+
+    def iter_results(self, mrun_load=False, mrun_save=True, retry_fail=0, func_retry_skip=None, func_change=None,
+                     load_fail_result=False, show_stats=True, inline=False, process_timeout=None, job_timeout=None,
+                     batch=None, journal=None, resume=False, keep=False):
+        '''
+        每个job的最终结果完成后立即yield, 需要重试的失败结果在重试后才yield, 每个kw只yield一次.
+        结束(或generator被关闭)后, 和run一样保存结果, 统计并显示概要.
+        for x in mr.iter_results(batch=100):
+            mm.update(x, ...)
+        :param batch:   None: yield每个结果; int: yield list, 最多batch个结果
+        :param keep:    self.results保留全部结果, 否则只保留统计需要的字段, mrun_save时总会保留
+        :param journal:
+        :param resume:  resume的结果不再yield
+        其他参数同run
+        :return:
+        '''
         self.control['inline'] = inline
         self.control['process_timeout'] = process_timeout
+        self.control['job_timeout'] = job_timeout
         self.cache['start_time'] = time.time()
         assert isinstance(retry_fail, int), 'retry_fail must be int.'
         result_path = self.path_temp / '{}_mrun_result.json'.format(get_caller().stem)
+        journal_path = self.path_temp / '{}_mrun_journal.jsonl'.format(get_caller().stem)
+        journal = mrun_save if journal is None else journal
+        results_loaded = None
         if mrun_load and result_path.exists():
-            is_ok, results = load_data(result_path)
+            is_ok, results_loaded = load_data(result_path)
         elif load_fail_result and result_path.exists():
-            is_ok, results = load_data(result_path)
+            is_ok, results_loaded = load_data(result_path)
             self.log.info('load results from {} .'.format(result_path))
-            self.func_kws = [x['kw'] for x in results]
-            self.func_kws_now = self.func_kws
+            self.func_kws = [x['kw'] for x in results_loaded]
             if retry_fail < 1:
                 retry_fail = 1
-        else:
-            self.func_kws_now = self.func_kws
-            is_ok, results = self.run_real(inline=inline, process_timeout=process_timeout, *args, **kwargs)
-            assert is_ok, results
-
-        # 重复运行
-        i = 0
-        _results = results
-        # presave_orders = [i for i, x in enumerate(_results)]
-        # idx_order = {x['idx']: i for i, x in enumerate(results)}
-        while i < retry_fail:
-            i += 1
-            fails = []
-            # orders = []
-            for j, x in enumerate(_results):
-                # ori_order = presave_orders[j]
-                if x['is_ok']:
+        self.func_kws_now = self.func_kws
+        keep = keep or mrun_save
+        results = []
+        buf = []
+        # 当前运行的job在self.func_kws中的位置和hash
+        positions = list(range(1, len(self.func_kws) + 1))
+        hashes = [job_hash(dict(kw, **self.func_common_kw)) for kw in self.func_kws]
+        if resume and results_loaded is None:
+            done = self.load_journal(journal_path)
+            for i, h in enumerate(hashes):
+                if h in done:
+                    self.func_kws[i].update(self.func_common_kw)
+                    results.append(dict(done[h], order_in=i + 1, kw=self.func_kws[i], resume=True))
+            positions = [i + 1 for i, h in enumerate(hashes) if h not in done]
+            hashes = [hashes[i - 1] for i in positions]
+            self.func_kws_now = [self.func_kws[i - 1] for i in positions]
+            self.log.info('resume {} results from {}, {} jobs left.'.format(len(results), journal_path,
+                                                                          len(positions)))
+        f_journal = None
+        if journal and results_loaded is None:
+            journal_path.parent.mkdir(exist_ok=True)
+            f_journal = open(journal_path, 'a' if resume else 'w')
+        it = self.iter_run(results_loaded, retry_fail=retry_fail, func_retry_skip=func_retry_skip,
+                           func_change=func_change, inline=inline, process_timeout=process_timeout,
+                           job_timeout=job_timeout)
+        try:
+            for x in it:
+                if results_loaded is None:
+                    i = x['order_in'] - 1
+                    x['order_in'] = positions[i]
+                    if f_journal:
+                        f_journal.write(json.dumps(dict({k: x.get(k) for k in ['is_ok', 'result', 'timer', 'kw']},
+                                                        hash=hashes[i]), default=str) + '\n')
+                        f_journal.flush()
+                results.append(x if keep else {k: x.get(k) for k in ['order_in', 'is_ok', 'miss', 'timeout', 'timer',
+                                                                     'kw'] if k != 'kw' or x.get('miss')})
+                if not batch:
+                    yield x
                     continue
-                if hasattr(func_retry_skip, '__call__') and func_retry_skip(x):
+                buf.append(x)
+                if len(buf) >= batch:
+                    yield buf
+                    buf = []
+            if buf:
+                yield buf
+        finally:
+            it.close()
+            if f_journal:
+                f_journal.close()
+            results.sort(key=lambda x: x['order_in'])
+            if mrun_save:
+                dump_data(results, result_path)
+            self.results = results
+            self.cache['timer_mrun'] = round(time.time() - self.cache['start_time'], 2)
+            self.show_miss()
+            self.stat_results(results)
+            if show_stats:
+                self.show_results()
+
+    def load_journal(self, path):
+        '''
+        :param path:
+        :return: {hash: result}, 成功的结果, 同一hash以最后一条为准. 中断时写了一半的行被忽略
+        '''
+        done = {}
+        if not path.exists():
+            return done
+        with open(path) as f:
+            for line in f:
+                try:
+                    x = json.loads(line)
+                except ValueError:
                     continue
-                # kw = x['kw']
-                if func_change and hasattr(func_change, '__call__'):
-                    x['kw'] = func_change(x)
-                fails.append(x)
-                # orders.append(ori_order)
-            if not fails:
-                self.log.info('There is no failed result need to be retried.\n'.format(len(fails), i))
-                break
-            self.func_kws_now = [x['kw'] for x in fails[:]]
-            self.log.info('*** Retry {} failed tasks in {} times !!! ***\n'.format(len(fails), i))
-            try_start_time = time.time()
-            is_ok, _results = self.run_real(*args, **kwargs)
-            assert is_ok, _results
-            # 有些miss result的，需要补上order_out
-            order_out_last = max([x.get('order_out', 0) for x in results])
-            for j, x in enumerate(_results):
-                # ori_order = presave_orders[j]
-                d = {'retry': i}
-                d.update({k: v for k, v in x.items() if k in ['is_ok', 'result', 'timer', 'kw']})
-                fails[j].update(d)
-                # results[ori_order].update(d)
-                if 'order_out' not in fails[j] and 'order_out' in x:  # 有可能retry时，又miss了
-                    fails[j]['order_out'] = x['order_out'] + order_out_last
-            # presave_orders = orders
-            retry_time = round(time.time() - try_start_time, 2)
-            self.cache['timer_retry'].append(retry_time)
-        if mrun_save:
-            dump_data(results, result_path)
-        self.results = results
-        self.cache['timer_mrun'] = round(time.time() - self.cache['start_time'], 2)
-        self.show_miss()
-        self.stat_results(results)
-        if show_stats:
-            self.show_results()
-        return is_ok, results
-
-    def run_real(self, inline=False, process_timeout=None):
-        '''
-        :param process_timeout: 进程超时
+                if x.get('is_ok'):
+                    done[x['hash']] = {k: x.get(k) for k in ['is_ok', 'result', 'timer']}
+                else:
+                    done.pop(x.get('hash'), None)
+        return done
+
+    def iter_run(self, results=None, retry_fail=0, func_retry_skip=None, func_change=None, inline=False,
+                 process_timeout=None, job_timeout=None):
+        '''
+        运行self.func_kws_now并重试失败的结果, yield最终结果
+        :param results: 已有的结果(mrun_load/load_fail_result), 只做重试
+        :return:
+        '''
+        i = 0
+        order_out_last = order_out_max = 0
+        fails_last = []
+        if results is None:
+            it = self.iter_real(inline=inline, process_timeout=process_timeout, job_timeout=job_timeout)
+        else:
+            it = iter(results)
+        try:
+            while True:
+                try_start_time = time.time()
+                fails = []
+                for x in it:
+                    if i:
+                        # 重试的结果更新到原结果, 有些miss result的，需要补上order_out
+                        y = fails_last[x['order_in'] - 1]
+                        y.pop('timeout', None)
+                        y.update({'retry': i}, **{k: v for k, v in x.items()
+                                                  if k in ['is_ok', 'result', 'timer', 'kw', 'timeout']})
+                        if 'order_out' not in y and 'order_out' in x:  # 有可能retry时，又miss了
+                            y['order_out'] = x['order_out'] + order_out_last
+                        x = y
+                    order_out_max = max(order_out_max, x.get('order_out', 0))
+                    if i < retry_fail and not x['is_ok'] and not (
+                            hasattr(func_retry_skip, '__call__') and func_retry_skip(x)):
+                        if func_change and hasattr(func_change, '__call__'):
+                            x['kw'] = func_change(x)
+                        fails.append(x)
+                        continue
+                    yield x
+                if i:
+                    self.cache['timer_retry'].append(round(time.time() - try_start_time, 2))
+                if i >= retry_fail:
+                    break
+                i += 1
+                if not fails:
+                    self.log.info('There is no failed result need to be retried.\n')
+                    break
+                order_out_last = order_out_max
+                fails_last = fails
+                self.func_kws_now = [x['kw'] for x in fails]
+                self.log.info('*** Retry {} failed tasks in {} times !!! ***\n'.format(len(fails), i))
+                it = self.iter_real(inline=inline, process_timeout=process_timeout, job_timeout=job_timeout)
+        finally:
+            if hasattr(it, 'close'):
+                it.close()
+
+    def run_real(self, inline=False, process_timeout=None, job_timeout=None):
+        '''
+        :param process_timeout: 总时间
+        :param job_timeout: 单个job的超时
         :param inline: 非多进程
         :return:
             {
@@ -208,75 +651,51 @@ class MultiRun(MyClass):
             'kw': {}
             }
         '''
-        if not inline:
-            m = Manager()
-            self.q_input = m.Queue()
-            self.q_output = m.Queue()
-            self.timer = m.dict()
-        else:
-            self.q_input = []
-            self.q_output = []
-            self.timer = {}
+        results = sorted(self.iter_real(inline=inline, process_timeout=process_timeout, job_timeout=job_timeout),
+                         key=lambda x: x['order_in'])
+        return True, results
+
+    def iter_real(self, inline=False, process_timeout=None, job_timeout=None):
+        '''
+        运行self.func_kws_now, 按完成顺序yield结果, 最后yield miss的结果
+        :param inline:
+        :param process_timeout:
+        :param job_timeout:
+        :return:
+        '''
+        self.timer = {}
         assert isinstance(self.func_kws_now, list), 'func_kws is not list.'
         idxes = OrderedDict()
+        jobs = []
         for i, kw in enumerate(self.func_kws_now, 1):
             idx = id(kw)
             kw.update(self.func_common_kw)
             d = {'order_in': i, 'idx': idx, 'kw': kw}
             idxes[idx] = d
-            if not inline:
-                self.q_input.put(d)
-            else:
-                self.q_input.append(d)
+            jobs.append(d)
 
-        if inline:
-            self.job(1, inline=True)
-        else:
-            process_num = min(self.default('process_num'), len(self.func_kws_now))
-            self.cache['process_num_use'] = process_num
-            self.show_debug('start {} process.'.format(process_num))
-            ps = []
-            for process_i in range(1, process_num + 1):
-                process = Process(target=self.job, args=([process_i, False]))
-                ps.append(process)
-                process.start()
-            for i, p in enumerate(ps):
-                p.join(timeout=process_timeout)
-            if process_timeout:
-                for i, p in enumerate(ps, 1):
-                    if p.is_alive():
-                        self.show_process_debug('terminate process {}.'.format(i))
-                        p.terminate()
-
-        outputs = {}
-        if not inline:
-            for i in range(1, self.q_output.qsize() + 1):
-                d = self.q_output.get_nowait()
-                d['order_out'] = i
-                outputs[d['idx']] = d
-        else:
-            for i, d in enumerate(self.q_output):
-                d['order_out'] = i + 1
-                outputs[d['idx']] = d
-        results = []
+        if jobs:
+            if inline:
+                dispatch = self.dispatch_inline(jobs)
+            else:
+                dispatch = getattr(self, 'dispatch_{}'.format(self.default('backend')))(jobs, process_timeout,
+                                                                                        job_timeout)
+            try:
+                for i, d in enumerate(dispatch, 1):
+                    d['order_out'] = i
+                    idxes.pop(d['idx'])
+                    yield d
+            finally:
+                dispatch.close()
         now = time.time()
         for idx, d in idxes.items():
-            if idx in outputs:
-                results.append(outputs[idx])
-            else:
-                d1 = {'is_ok': False,
-                      'miss': True,
-                      'result': 'result is not exist.',
-                      'order_in': d['order_in'],
-                      'kw': d['kw'],
-                      'timer': round((now - self.timer[idx]) if self.timer.get(idx) else 9999, 2),
-                      }
-                results.append(d1)
-
-        # results = [outputs.get(idx, {'is_ok': False, 'miss': True, 'result': 'result is not exist.',
-        #                              'order_in': d['order_in'],t
-        #                              'kw': d['kw']}) for idx, d in idxes.items()]
-        return True, results
+            yield {'is_ok': False,
+                   'miss': True,
+                   'result': 'result is not exist.',
+                   'order_in': d['order_in'],
+                   'kw': d['kw'],
+                   'timer': round((now - self.timer[idx]) if self.timer.get(idx) else 9999, 2),
+                   }
 
     def show_process_debug(self, *obj):
         self.show_by_flag(self.default('show_process'), *obj)
@@ -295,6 +714,8 @@ class MultiRun(MyClass):
                 self.stat['success'] += 1
             else:
                 self.stat['fail'] += 1
+                if x.get('timeout'):
+                    self.stat['timeout'] += 1
         l = [{'id': i, 'timer': x['timer'], 'miss': x.get('miss'), 'is_ok': x['is_ok']} for i, x in enumerate(results)]
         l.sort(key=lambda v: v['timer'], reverse=True)
 
@@ -328,8 +749,9 @@ class MultiRun(MyClass):
                                    'timer_max_fail': timer_max_fail})
 
     def show_results(self):
-        msg = 'Total: {total}, Success: {success}, Fail: {fail}, Miss: {miss}. '.format(**self.stat)
-        msg += 'Duration: {timer_mrun}s, Process: {process_num}, Timeout: {process_timeout}, Inline: {inline}.'.format(
+        msg = 'Total: {total}, Success: {success}, Fail: {fail} (timeout {timeout}), Miss: {miss}. '.format(**self.stat)
+        msg += 'Duration: {timer_mrun}s, Backend: {backend}, Process: {process_num}, Timeout: {process_timeout}, ' \
+               'Job timeout: {job_timeout}, Inline: {inline}.'.format(
             **self.cache, **self.control)
         if self.cache['timer_retry']:
             msg += ', including '
@@ -393,7 +815,7 @@ class MultiRun(MyClass):
 
 
 class MrunArgParse(ArgParseClass):
-    def __init__(self, process_num=60, process_timeout=60, *args, **kwargs):
+    def __init__(self, process_num=60, process_timeout=None, *args, **kwargs):
         ArgParseClass.__init__(self, *args, **kwargs)
         self.process_num = process_num
         self.process_timeout = process_timeout
@@ -402,13 +824,17 @@ class MrunArgParse(ArgParseClass):
         self.add('--process_num', type=int, default=process_num or self.process_num,
                  help='进程数量，{}'.format(process_num or self.process_num),
                  group=group)
-        self.add('--process_timeout', type=int, default=process_timeout or self.process_timeout,
-                 help='进程超时时间, default {}s'.format(process_timeout or self.process_timeout), group=group)
+        process_timeout = process_timeout or self.process_timeout
+        self.add('--process_timeout', type=int, default=process_timeout,
+                 help='整个运行的总超时时间, 超时后未完成的job为miss, default {}'.format(
+                     '{}s'.format(process_timeout) if process_timeout else 'None(不限制)'), group=group)
+        self.add('--job_timeout', type=int, help='单个job超时时间, 只重启超时的进程', group=group)
         self.add('--inline', action='store_true', default=False, help='串行模式', group=group)
         self.add('--show_process', action='store_true', default=False, help='显示进程操作过程', group=group)
         self.add('--retry_fail', type=int, default=0, help='重试失败次数，默认0', group=group)
         self.add('--load_fail_result', action='store_true', default=False, help='载入原先失败的结果', group=group)
         self.add('--mrun_load', action='store_true', default=False, help='载入原先的结果', group=group)
+        self.add('--resume', action='store_true', default=False, help='跳过journal中已成功的job', group=group)
 
     # def add_all(self):
     #     self.add_base(self)
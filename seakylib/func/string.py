@@ -120,6 +120,28 @@ def add_quote(v, to_str=True, split=False, delimiter=',', strip=True, quote='"')
         return '{0}{1}{0}'.format(quote, replace(v, pats=['(^"|"$)', "(^'|'$)"]))
 
 
+TSV_ESCAPE = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def tsv_line(values):
+    '''
+    LOAD DATA 默认格式的一行, 字段以tab分割, None为\\N, \\ tab 换行用\\转义
+    :param values:  list/tuple
+    :return:
+    '''
+    l = []
+    for v in values:
+        if v is None:
+            l.append('\\N')
+        elif isinstance(v, bool):
+            l.append('1' if v else '0')
+        elif isinstance(v, bytes):
+            l.append(v.decode('utf-8').translate(TSV_ESCAPE))
+        else:
+            l.append(str(v).translate(TSV_ESCAPE))
+    return '\t'.join(l) + '\n'
+
+
 def str2list(s, sep=',', preserve_blank=False, wrapper='', filter=None):
     '''
     分割字符串，添加引号
@@ -11,9 +11,10 @@ execute_sql_remote(sql, db_host='localhost', db_port=3306, db_user, db_pass, db_
 import os
 import re
 from pathlib import Path
-from subprocess import run, PIPE, STDOUT
+from subprocess import run, Popen, PIPE, STDOUT
 
 from ..func.base import MyClass
+from ..func.string import tsv_line
 
 PRINT_ERROR = True
 
@@ -83,7 +84,7 @@ def make_ssh_cmd(cmd, ssh_host, ssh_port=22, ssh_user=None, ssh_keyfile=None, en
     return cmd2
 
 
-def make_cmd_sql(sql, db_user, db_pass, db_name, db_host='localhost', db_port=3306, **kwargs):
+def make_cmd_sql(sql, db_user, db_pass, db_name, db_host='localhost', db_port=3306, options='', **kwargs):
     '''
     :param sql: 语句中都使用双引号
     :param db_user:
@@ -91,10 +92,11 @@ def make_cmd_sql(sql, db_user, db_pass, db_name, db_host='localhost', db_port=33
     :param db_name:
     :param db_host:
     :param db_port:
+    :param options: mysql的其他参数, 如 --local-infile=1
     :return:
     '''
-    cmd = 'export MYSQL_PWD=\'{}\' && mysql -h {} -P {} -u {} {} -e \'{}\''.format(db_pass, db_host, db_port, db_user,
-                                                                                   db_name, sql)
+    cmd = 'export MYSQL_PWD=\'{}\' && mysql -h {} -P {} -u {} {}{} -e \'{}\''.format(
+        db_pass, db_host, db_port, db_user, '{} '.format(options) if options else '', db_name, sql)
     return cmd
 
 
@@ -326,7 +328,7 @@ class OSSQL(MyClass):
         return self.insert(*args, **kwargs)
 
     def insert(self, table_name, data, db_name=None, columns=None, columns_func=None, chunk=1000, limit=None,
-               truncate=False):
+               truncate=False, duplicate=None):
         '''
         可能会报 Argument list too long 错误，需要减小chunk
         :param table_name:
@@ -337,18 +339,21 @@ class OSSQL(MyClass):
         :param chunk:
         :param limit:
         :param truncate:
+        :param duplicate:   None, 'replace'(REPLACE INTO), 'ignore'(INSERT IGNORE)
         :return:
         '''
+        assert duplicate in [None, 'replace', 'ignore'], 'duplicate {} is not supported.'.format(duplicate)
+        if db_name is None:
+            db_name = self.db_auth['db_name']
         if not columns:
             if isinstance(data, list) and isinstance(data[0], dict):
-                table_cols = self.get_table_columns_info(table_name=table_name).keys()
+                table_cols = self.get_table_columns_info(table_name=table_name, db_name=db_name).keys()
                 columns = [x for x in list(data[0].keys()) if x in table_cols]
         assert columns, 'no columns given when perform insert'
 
-        if db_name is None:
-            db_name = self.db_auth['db_name']
-        sql = 'INSERT INTO `{}`.`{}` ( {} ) VALUES'.format(db_name, table_name,
-                                                           ','.join(['`{}`'.format(x) for x in columns]))
+        verb = {None: 'INSERT', 'replace': 'REPLACE', 'ignore': 'INSERT IGNORE'}[duplicate]
+        sql = '{} INTO `{}`.`{}` ( {} ) VALUES'.format(verb, db_name, table_name,
+                                                       ','.join(['`{}`'.format(x) for x in columns]))
 
         if isinstance(data, dict):
             item0 = data[data.keys()[0]]
@@ -365,14 +370,15 @@ class OSSQL(MyClass):
         else:
             assert False, 'data is not acceptable.'
 
-        columns_func = self.auto_generate_columns_func(table_name=table_name, columns_func=columns_func)
+        columns_func = self.auto_generate_columns_func(table_name=table_name, db_name=db_name,
+                                                       columns_func=columns_func)
 
         data1 = column_map(data1, columns_func, to_sql=True)
         if isinstance(limit, int):
             data1 = data1[:limit]
 
         if truncate:
-            cmd = 'TRUNCATE {}'.format(table_name)
+            cmd = 'TRUNCATE `{}`.`{}`'.format(db_name, table_name)
             self.exec(cmd)
 
         self.log.debug('insert {} items into table {}.{}'.format(len(data), db_name, table_name))
@@ -390,6 +396,98 @@ class OSSQL(MyClass):
             self.exec(_sql, print_error=True, silence=True)
         return True
 
+    def refresh(self, table_name, data, db_name=None, columns=None, mode='swap', keep_old=False, **kwargs):
+        '''
+        整表替换, 比flush的 truncate + insert 读侧无空表
+        swap: 加载到<table>_new (create like), 然后 RENAME TABLE t TO t_old, t_new TO t, 原子交换
+        :param table_name:
+        :param data:
+        :param db_name:
+        :param columns:
+        :param mode:    'swap', 'truncate'
+        :param keep_old:    保留<table>_old
+        :param kwargs:  bulk_load的参数
+        :return:
+        '''
+        if mode == 'truncate':
+            return self.bulk_load(table_name, data, db_name=db_name, columns=columns, truncate=True, **kwargs)
+        assert mode == 'swap', 'mode {} is not supported.'.format(mode)
+        if db_name is None:
+            db_name = self.db_auth['db_name']
+        if not columns:
+            if isinstance(data, list) and isinstance(data[0], dict):
+                table_cols = self.get_table_columns_info(table_name=table_name, db_name=db_name).keys()
+                columns = [x for x in list(data[0].keys()) if x in table_cols]
+        t, t_new, t_old = ['`{}`.`{}`'.format(db_name, x) for x in
+                           [table_name, '{}_new'.format(table_name), '{}_old'.format(table_name)]]
+        p = self.exec('DROP TABLE IF EXISTS {1}, {2}; CREATE TABLE {1} LIKE {0}'.format(t, t_new, t_old))
+        if p.returncode != 0:
+            return False
+        if not self.bulk_load('{}_new'.format(table_name), data, db_name=db_name, columns=columns, **kwargs):
+            self.exec('DROP TABLE IF EXISTS {}'.format(t_new))
+            return False
+        sql = 'RENAME TABLE {0} TO {2}, {1} TO {0}'.format(t, t_new, t_old)
+        if not keep_old:
+            sql += '; DROP TABLE {}'.format(t_old)
+        return self.exec(sql).returncode == 0
+
+    def bulk_load(self, table_name, data, db_name=None, columns=None, truncate=False, duplicate=None,
+                  fallback=True, chunk=1000):
+        '''
+        LOAD DATA LOCAL INFILE "/dev/stdin", 数据以TSV格式写入mysql命令行的stdin, 不生成sql文本.
+        NULL为\\N, \\ tab 换行被转义. ssh时stdin经ssh传给远程的mysql.
+        如果local_infile被禁止, fallback到insert
+        :param table_name:
+        :param data:    list of dicts or list of lists
+        :param db_name:
+        :param columns:  可以从 data[0] 中提取
+        :param truncate:
+        :param duplicate:   None, 'replace', 'ignore'. LOAD DATA LOCAL跳过重复key(同IGNORE), None时有跳过的行返回False,
+            和insert的报错一致, 已加载的行不回滚
+        :param fallback:    local_infile不可用时使用insert
+        :param chunk:   insert的chunk
+        :return:
+        '''
+        if db_name is None:
+            db_name = self.db_auth['db_name']
+        if not columns:
+            if isinstance(data, list) and isinstance(data[0], dict):
+                table_cols = self.get_table_columns_info(table_name=table_name, db_name=db_name).keys()
+                columns = [x for x in list(data[0].keys()) if x in table_cols]
+        assert columns, 'no columns given when perform bulk_load'
+        sql = 'LOAD DATA LOCAL INFILE "/dev/stdin" {}INTO TABLE `{}`.`{}` CHARACTER SET utf8mb4 ({})'.format(
+            '{} '.format(duplicate.upper()) if duplicate else '', db_name, table_name, ','.join(['`{}`'.format(x) for x in columns]))
+        if truncate:
+            self.exec('TRUNCATE `{}`.`{}`'.format(db_name, table_name))
+        self.log.debug('load {} items into table {}.{}'.format(len(data), db_name, table_name))
+        self.log.debug(sql)
+        # -vv prints "Records: 3  Deleted: 0  Skipped: 1  Warnings: 1"
+        cmd = make_cmd_sql(sql, options='--local-infile=1 -vv', **self.db_auth)
+        if self.ssh_auth:
+            cmd = make_ssh_cmd(cmd=cmd, **dict(self.ssh_auth, ssh_quite=True))
+        p = Popen(cmd, shell=True, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
+        try:
+            for x in data:
+                p.stdin.write(tsv_line([x.get(c) for c in columns] if isinstance(x, dict) else x).encode('utf-8'))
+            p.stdin.close()
+        except BrokenPipeError:
+            # mysql exits at once when LOAD DATA LOCAL is refused
+            pass
+        output = p.stdout.read().decode('utf-8')
+        p.wait()
+        if p.returncode == 0:
+            m = re.search(r'Skipped: (\d+)', output)
+            if not duplicate and m and int(m.group(1)):
+                self.log.error('duplicate key in {}.{}, {} rows skipped.'.format(db_name, table_name, m.group(1)))
+                print(output)
+                return False
+            return True
+        if fallback and re.search('ERROR (1148|2068|3948)', output):
+            self.log.debug('local_infile is disabled, fallback to insert. {}'.format(output.strip()))
+            return self.insert(table_name, data, db_name=db_name, columns=columns, chunk=chunk, duplicate=duplicate)
+        print(output)
+        return False
+
     def get_table_columns_info(self, table_name, db_name=None):
         if db_name is None:
             db_name = self.db_auth['db_name']
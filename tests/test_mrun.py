@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 18:30
+
+import json
+
+import pytest
+
+from seakylib.func.mrun import MultiRun, job_hash
+
+CALLS = []
+
+
+def double(i, fail=(), **kwargs):
+    CALLS.append(i)
+    if i in fail:
+        return False, 'fail {}'.format(i)
+    return True, i * 2
+
+
+def test_job_hash():
+    assert job_hash({'a': 1, 'b': [1, 2]}) == job_hash({'b': [1, 2], 'a': 1})
+    assert job_hash({'a': 1}) != job_hash({'a': '1'})
+    assert len(job_hash({'a': object()})) == 40
+
+
+@pytest.fixture
+def mr(tmp_path):
+    CALLS.clear()
+
+    def make(fail=(), n=10):
+        return MultiRun(func=double, func_kws=[{'i': i} for i in range(n)], func_common_kw={'fail': fail},
+                        add_log_to_common_kw=False, path_temp=str(tmp_path), quite=True)
+
+    return make
+
+
+def test_load_journal(mr, tmp_path):
+    m = mr()
+    path = tmp_path / 'journal.jsonl'
+    assert m.load_journal(path) == {}
+    lines = [{'hash': 'a', 'is_ok': True, 'result': 1}, {'hash': 'b', 'is_ok': True, 'result': 2},
+             {'hash': 'a', 'is_ok': False, 'result': 'x'}, {'hash': 'c', 'is_ok': False, 'result': 'y'},
+             {'hash': 'b', 'is_ok': True, 'result': 3}]
+    with open(path, 'w') as f:
+        f.write(''.join(json.dumps(x) + '\n' for x in lines) + '{"hash": "d", "is_o')
+    assert m.load_journal(path) == {'b': {'is_ok': True, 'result': 3, 'timer': None}}
+
+
+@pytest.mark.parametrize('inline', [True, False])
+def test_resume(mr, tmp_path, inline):
+    is_ok, results = mr(fail=(3, 7)).run(inline=inline, show_stats=False)
+    assert [x['is_ok'] for x in results] == [i not in (3, 7) for i in range(10)]
+    journal = list(tmp_path.glob('*_mrun_journal.jsonl'))
+    assert len(journal) == 1 and len(journal[0].read_text().splitlines()) == 10
+
+    CALLS.clear()
+    # the same common kw, only the failed jobs run again
+    m = mr(fail=(3, 7))
+    is_ok, results = m.run(inline=inline, resume=True, show_stats=False)
+    if inline:
+        assert sorted(CALLS) == [3, 7]
+    assert [x['order_in'] for x in results] == list(range(1, 11))
+    assert [bool(x.get('resume')) for x in results] == [i not in (3, 7) for i in range(10)]
+    assert [x['result'] for x in results if x['is_ok']] == [i * 2 for i in range(10) if i not in (3, 7)]
+    assert len(journal[0].read_text().splitlines()) == 12
+
+    # another common kw is another job
+    CALLS.clear()
+    is_ok, results = mr(fail=(3,)).run(inline=inline, resume=True, show_stats=False)
+    if inline:
+        assert sorted(CALLS) == list(range(10))
+    assert all(not x.get('resume') for x in results)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 16:30
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('sqlalchemy.ext.asyncio')
+
+from seakylib.data import mysql
+from seakylib.data.benchmark import make_model
+
+
+def test_retry_backoff_does_not_block_loop(tmp_path, monkeypatch):
+    # every error is retryable, the query of a missing table fails retry+1 times
+    monkeypatch.setattr(mysql, 'classify_error', lambda e: ('deadlock', True))
+    monkeypatch.setattr(mysql.random, 'uniform', lambda a, b: b)
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    amm = mysql.AsyncMyModel(make_model(), engine_kw={'conn_str': 'sqlite+aiosqlite:///{}'.format(tmp_path / 'a.db'),
+                                                      'poolclass': AsyncAdaptedQueuePool})
+    amm.retry = 3
+    amm.retry_backoff = amm.retry_backoff_max = 0.1
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        task = asyncio.ensure_future(ticker())
+        is_ok, result = await amm.query()
+        task.cancel()
+        await mysql.dispose_async_engines()
+        return is_ok
+
+    assert asyncio.run(main()) is False
+    # 0.3s of backoff, the loop keeps running
+    assert len(ticks) > 15
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 15:30
+
+import pytest
+from sqlalchemy.pool import QueuePool
+
+from seakylib.data.benchmark import make_model, make_rows
+from seakylib.data.mysql import MyModel
+
+
+@pytest.fixture
+def mm(tmp_path):
+    mm = MyModel(make_model(), engine_kw={'conn_str': 'sqlite:///{}'.format(tmp_path / 'a.db'), 'poolclass': QueuePool})
+    mm.create_table()
+    mm.cache['variables'] = {'max_allowed_packet': 4194304}
+    return mm
+
+
+def test_stmt_length_of_driver(mm):
+    # sqlite3 does not split executemany
+    assert mm.stmt_length() is None
+
+
+@pytest.mark.parametrize('stmt_length', [None, 1024000, 65536])
+def test_auto_block_follows_stmt_length(mm, stmt_length):
+    mm.cache['variables']['max_stmt_length'] = stmt_length
+    rows = make_rows(200)
+    block = mm.auto_block(rows)
+    size = sum(len(str(v)) + 4 for x in rows[:100] for k, v in x.items() if k in mm.cols_name) / 100 + 2
+    assert block * size <= min(4194304, stmt_length or 4194304) * 0.8
+    assert block * size > min(4194304, stmt_length or 4194304) * 0.7
+
+
+class Literal:
+    '''escape of pymysql.Connection.literal, the sqlite3 connection has none'''
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __getattr__(self, item):
+        return getattr(self.conn, item)
+
+    def literal(self, v):
+        from pymysql.converters import escape_item
+        return escape_item(v, 'utf8')
+
+    encoding = 'utf8'
+
+
+def test_param_single_counts_escaped_bytes(mm, monkeypatch):
+    pytest.importorskip('pymysql')
+    from sqlalchemy import column, table
+    stmt = table(mm.model.__tablename__, column('note')).insert()
+    mm.cache['variables']['max_stmt_length'] = 1000
+    # sqlite3 has no escape, never trust LAST_INSERT_ID
+    assert mm._param_single(stmt, [{'note': 'a'}]) is False
+    conn = type('Connection', (), {'connection': Literal(mm.session.connection().connection)})
+    monkeypatch.setattr(mm.session, 'connection', conn)
+    assert mm._param_single(stmt, [{'note': 'a' * 10}] * 10) is True
+    # 300 chars by str(), but 600 bytes after escaping
+    assert mm._param_single(stmt, [{'note': '\\' * 300}]) is True
+    assert mm._param_single(stmt, [{'note': '\\' * 300}] * 2) is False
+    # 400 chars by str(), but 1200 bytes after utf8 encoding
+    assert mm._param_single(stmt, [{'note': '中' * 400}]) is False
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 17:30
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.pool import QueuePool
+
+from seakylib.data import mysql
+from seakylib.data.benchmark import make_model, make_rows
+from seakylib.data.mysql import MyModel
+
+
+@pytest.fixture
+def mm(tmp_path):
+    mm = MyModel(make_model(), engine_kw={'conn_str': 'sqlite:///{}'.format(tmp_path / 'a.db'), 'poolclass': QueuePool})
+    mm.create_table()
+    mm.cache['variables'] = {'max_allowed_packet': 4194304, 'local_infile': 'OFF'}
+    return mm
+
+
+class LocalInfile:
+    '''engine of LOAD DATA LOCAL which skips `skip` rows of each file like mysql does on duplicate keys'''
+
+    def __init__(self, skip):
+        self.skip = skip
+        self.sqls = []
+        self.rolled_back = False
+
+    def execute(self, sql):
+        self.sqls.append(sql)
+        with open(sql.split('"')[1]) as f:
+            return type('Result', (), {'rowcount': len(f.readlines()) - self.skip})
+
+    @contextmanager
+    def begin(self):
+        try:
+            yield self
+        except Exception:
+            self.rolled_back = True
+            raise
+
+
+@pytest.mark.parametrize('duplicate,ok', [(None, False), ('ignore', True), ('replace', True)])
+def test_local_infile_skipped_rows(mm, monkeypatch, duplicate, ok):
+    eng = LocalInfile(skip=1)
+    monkeypatch.setattr(mysql, 'engine', lambda **kwargs: eng)
+    mm.cache['variables']['local_infile'] = 'ON'
+    is_ok, result = mm.bulk_load(make_rows(10), duplicate=duplicate, block=4)
+    assert is_ok is ok
+    assert eng.rolled_back is not ok
+    if ok:
+        assert result['method'] == 'load_data' and result['loaded'] == 7
+    else:
+        assert 'duplicate key' in str(result)
+
+
+def test_fallback_duplicate(mm):
+    rows = make_rows(10)
+    assert mm.bulk_load(rows[:5])[0]
+    # the same as LOAD DATA LOCAL without IGNORE/REPLACE
+    is_ok, result = mm.bulk_load(rows[3:])
+    assert not is_ok and 'IntegrityError' in str(result)
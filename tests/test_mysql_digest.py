@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 18:00
+
+import hashlib
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import Column, Integer, String, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import QueuePool
+
+from seakylib.data.mysql import MyModel, digest_sql, local_digests, sql_str
+
+
+def test_sql_str():
+    assert [sql_str(x) for x in [True, 1.0, 1.5, Decimal('1.50'), b'a', date(2020, 1, 2),
+                                 datetime(2020, 1, 2, 3, 4, 5), datetime(2020, 1, 2, 3, 4, 5, 6)]] == \
+           ['1', '1', '1.5', '1.50', 'a', '2020-01-02', '2020-01-02 03:04:05', '2020-01-02 03:04:05.000006']
+
+
+def test_same_edit_of_two_rows():
+    old = [{'k': 1, 'v': 'aa'}, {'k': 2, 'v': 'ab'}]
+    new = [{'k': 1, 'v': 'ab'}, {'k': 2, 'v': 'aa'}]
+    crc = lambda rows: zlib.crc32('1|{}|0'.format(rows[0]['v']).encode()) ^ \
+                       zlib.crc32('2|{}|0'.format(rows[1]['v']).encode())
+    # CRC32 is affine, the same xor delta of two rows of the same length cancels
+    assert crc(old) == crc(new)
+    assert local_digests(old, 'k', cols=['v'], buckets=1)[0] != local_digests(new, 'k', cols=['v'], buckets=1)[0]
+
+
+def test_null_flags():
+    d = lambda rows: local_digests(rows, 'k', cols=['a', 'b'], buckets=1)[0]
+    # CONCAT_WS skips NULL, "1|x" for both rows without the flags
+    assert d([{'k': 1, 'a': 'x', 'b': None}]) != d([{'k': 1, 'a': None, 'b': 'x'}])
+    assert d([{'k': 1, 'a': '', 'b': None}]) != d([{'k': 1, 'a': None, 'b': ''}])
+
+
+def test_local_digests():
+    rows = [{'k': 'k{}'.format(i), 'v': i} for i in range(100)]
+    d, bucket_of = local_digests(rows, 'k', cols=['v'], buckets=8)
+    assert sum(c for c, x in d.values()) == 100
+    assert set(bucket_of.values()) == set(d)
+    assert bucket_of['k3'] == zlib.crc32(b'k3') % 8
+    # the digest does not depend on the order of rows
+    assert local_digests(rows[::-1], 'k', cols=['v'], buckets=8)[0] == d
+    x = int(hashlib.md5(b'k3|3|0').hexdigest()[:15], 16)
+    assert local_digests([rows[3]], 'k', cols=['v'], buckets=8)[0] == {bucket_of['k3']: (1, x)}
+
+
+class BitXor:
+    def __init__(self):
+        self.v = 0
+
+    def step(self, x):
+        self.v ^= x
+
+    def finalize(self):
+        return self.v
+
+
+@pytest.fixture
+def mysql_functions():
+    def connect(conn, rec):
+        conn.create_function('CRC32', 1, lambda v: zlib.crc32(sql_str(v).encode()))
+        conn.create_function('MD5', 1, lambda v: hashlib.md5(sql_str(v).encode()).hexdigest())
+        conn.create_function('CONV', 3, lambda s, a, b: int(s, a))
+        conn.create_function('CONCAT_WS', -1, lambda sep, *a: sep.join(sql_str(x) for x in a if x is not None))
+        conn.create_function('CONCAT', -1, lambda *a: ''.join(sql_str(x) for x in a))
+        conn.create_aggregate('BIT_XOR', 1, BitXor)
+
+    event.listen(Engine, 'connect', connect)
+    yield
+    event.remove(Engine, 'connect', connect)
+
+
+def test_digests_of_mysql(tmp_path, mysql_functions):
+    class T(declarative_base()):
+        __tablename__ = 't'
+        id = Column(Integer, primary_key=True, autoincrement=True)
+        k = Column(Integer, unique=True)
+        v = Column(String(32))
+        n = Column(Integer)
+
+    mm = MyModel(T, engine_kw={'conn_str': 'sqlite:///{}'.format(tmp_path / 'a.db'), 'poolclass': QueuePool})
+    mm.create_table()
+    rows = [{'k': i, 'v': 'a{}'.format(i), 'n': None if i % 3 else i} for i in range(1000)]
+    assert mm.add_all([dict(x) for x in rows], mode='param', get_ids=False)[0]
+    assert mm.digests('k', cols=['v', 'n'], buckets=16) == local_digests(rows, 'k', cols=['v', 'n'], buckets=16)[0]
+    assert mm.digests('k', buckets=16) == local_digests(rows, 'k', buckets=16)[0]
+    assert 'MD5' in digest_sql('k', ['v']) and 'CRC32' not in digest_sql('k', ['v'])
+
+    # the same edit in two rows of one bucket is found
+    new = [dict(x) for x in rows]
+    new[1]['v'], new[2]['v'] = 'a2', 'a1'
+    is_ok, r = mm.update(new, key='k', checksum=100, time_check=None, ret_str=False)
+    assert is_ok, r
+    assert r['changed'] == 2 and r['checksum']['buckets_diff'] >= 1
+    is_ok, r = mm.update([dict(x) for x in new], key='k', checksum=100, time_check=None, ret_str=False)
+    assert is_ok and r['changed'] == 0 and r['checksum']['buckets_diff'] == 0
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 15:00
+
+import os
+
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+
+from seakylib.data import mysql
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    mysql.dispose_engines()
+    yield
+    mysql.dispose_engines()
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'poolclass': NullPool}, {'poolclass': StaticPool}])
+def test_engine_stats_without_queue_pool(tmp_path, kwargs):
+    conn_str = 'sqlite:///{}'.format(tmp_path / 'a.db') if kwargs.get('poolclass') is NullPool else 'sqlite://'
+    mysql.engine(conn_str, **kwargs).execute('select 1')
+    stats = mysql.engine_stats(conn_str)
+    assert len(stats) == 1
+    assert not [k for k in stats[0] if k in ['pool_size', 'pool_checkedin', 'pool_overflow']]
+    assert stats[0]['checkouts'] >= 1
+
+
+def test_engine_stats_queue_pool(tmp_path):
+    conn_str = 'sqlite:///{}'.format(tmp_path / 'a.db')
+    mysql.engine(conn_str, poolclass=QueuePool).execute('select 1')
+    stats = mysql.engine_stats(conn_str)
+    assert stats[0]['pool_size'] == 10
+    assert stats[0]['pool_checkedout'] == 0
+
+
+def test_engine_registry_after_fork(tmp_path):
+    conn_str = 'sqlite:///{}'.format(tmp_path / 'a.db')
+    parent = mysql.engine(conn_str, poolclass=QueuePool)
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        child = mysql.engine(conn_str, poolclass=QueuePool)
+        ok = child is not parent and mysql.ENGINES['inherited'][-1]['engine'] is parent
+        os.write(w, b'1' if ok else b'0')
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(r, 1) == b'1'
+    assert mysql.engine(conn_str, poolclass=QueuePool) is parent
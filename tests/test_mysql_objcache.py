@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 17:00
+
+import threading
+
+from seakylib.data import mysql
+from seakylib.data.mysql import ObjCache
+
+
+def test_lru():
+    cache = ObjCache(maxsize=2, ttl=0)
+    cache.set(('id', 1), {'id': 1})
+    cache.set(('id', 2), {'id': 2})
+    assert cache.get(('id', 1)) == {'id': 1}
+    # 2 is the least recently used
+    cache.set(('id', 3), {'id': 3})
+    assert cache.get(('id', 2)) is None
+    assert cache.get(('id', 1)) == {'id': 1}
+    assert list(cache.data) == [('id', 3), ('id', 1)]
+    assert cache.stat == {'hits': 2, 'misses': 1, 'evictions': 1, 'invalidations': 0}
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(mysql.time, 'time', lambda: now[0])
+    cache = ObjCache(ttl=60)
+    cache.set(('id', 1), {'id': 1})
+    now[0] += 59
+    assert cache.get(('id', 1)) == {'id': 1}
+    now[0] += 2
+    assert cache.get(('id', 1)) is None
+    assert not cache.data
+
+
+def test_invalidate():
+    cache = ObjCache()
+    cache.set(('id', 1), {'id': 1})
+    cache.set(('id', 2), {'id': 2})
+    cache.pop(('id', 1))
+    cache.pop(('id', 3))
+    assert cache.stat['invalidations'] == 1
+    cache.clear()
+    assert cache.stat['invalidations'] == 2 and not cache.data
+
+
+def test_threads():
+    cache = ObjCache(maxsize=50, ttl=0)
+
+    def run(n):
+        for i in range(5000):
+            k = ('id', (n * 7 + i) % 200)
+            if cache.get(k) is None:
+                cache.set(k, {'id': k[1]})
+            if i % 13 == 0:
+                cache.pop(k)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(cache.data) <= 50
+    assert cache.stat['hits'] + cache.stat['misses'] == 8 * 5000
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 16:00
+
+import pytest
+from sqlalchemy.pool import QueuePool
+
+from seakylib.data.benchmark import make_model, make_rows
+from seakylib.data.mysql import MyModel
+
+
+@pytest.fixture
+def mm(tmp_path):
+    mm = MyModel(make_model(), engine_kw={'conn_str': 'sqlite:///{}'.format(tmp_path / 'a.db'), 'poolclass': QueuePool})
+    mm.create_table()
+    return mm
+
+
+def test_update_case_strategy(mm):
+    lst = [(dict(x, value=1), x) for x in make_rows(3)]
+    is_ok, result = mm._update_case(['value'], lst, 'name', None, dryrun=True, strategy='join')
+    assert is_ok and result['strategy'] == 'join'
+    is_ok, result = mm._update_case(['value'], lst, 'name', None, dryrun=True, strategy='case')
+    assert is_ok and result['strategy'] == 'case'
+    with pytest.raises(AssertionError):
+        mm._update_case(['value'], lst, 'name', None, dryrun=True, strategy='auto')
+
+
+def test_update_join_missing_column(mm, monkeypatch):
+    sqls = []
+    monkeypatch.setattr(mm.session, 'execute', lambda sql, *args: sqls.append((sql, args)))
+    monkeypatch.setattr(mm, 'commit', lambda: None)
+    rows = make_rows(3)
+    lst = [(dict(x, value=1), x) for x in rows]
+    is_ok, result = mm._update_join(['value', 'note'], lst, 'name', None)
+    assert is_ok
+    assert sqls[2][1][0][0] == {'name': 'name_0', 'value': 1, 'note': rows[0]['note']}
+    lst[1][0].pop('note')
+    # CASE raises KeyError on a missing column, join should not write NULL
+    with pytest.raises(KeyError):
+        mm._update_join(['value', 'note'], lst, 'name', None)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 18:30
+
+import pytest
+
+from seakylib.data.sqlprofile import Histogram, SqlProfile, fingerprint, phase
+
+
+@pytest.mark.parametrize('sql,fp', [
+    ('select * from t where id = 1 and name = "a\\"b"', 'select * from t where id = ? and name = ?'),
+    ("select * from t where x = 'it''s' and y=-1.5e3", 'select * from t where x = ?? and y=?'),
+    ('insert into t (a, b) values (1, "x"), (2, "y"), (3, NULL)', 'insert into t (a, b) values (?+)+'),
+    ('INSERT INTO t (a, b) VALUES (%(a)s, %(b)s)', 'INSERT INTO t (a, b) VALUES (?+)'),
+    ('select * from t where id in (1,2,3) and b is null', 'select * from t where id in (?+) and b is null'),
+    ('select `t1`.c2 from t1', 'select `t1`.c2 from t1'),
+    ('update t\n set `v` = case `k` WHEN 1 THEN 2 WHEN 3 THEN 4 END where k in (1, 3)',
+     'update t set `v` = case `k` WHEN ? THEN ? ... END where k in (?+)'),
+])
+def test_fingerprint(sql, fp):
+    assert fingerprint(sql) == fp
+
+
+def test_same_shape():
+    assert fingerprint('select * from t where id in (1, 2)') == fingerprint('select * from t where id in (3,4,5,6)')
+    assert fingerprint('insert into t values (1), (2)') == fingerprint('insert into t values (1), (2), (3)')
+
+
+def test_profile():
+    with phase('outside'):
+        pass
+    with SqlProfile(slow=1) as prof:
+        with phase('diff'):
+            pass
+        prof.record('select * from t where id = 1', 0.2, 1, 10)
+        prof.record('select * from t where id = 2', 0.1, 1, 10)
+        prof.record('delete from t where id = 3', 0.3, -1, 5)
+    d = prof.summary()
+    assert list(d['phases']) == ['diff', 'total']
+    assert d['sql_count'] == 3 and d['sql_time'] == pytest.approx(0.6)
+    assert d['statements']['select * from t where id = ?'] == {'count': 2, 'time': pytest.approx(0.3), 'rows': 2,
+                                                               'bytes': 20}
+    assert d['statements']['delete from t where id = ?']['rows'] == 0
+    assert [x['time'] for x in d['slow']] == [0.3]
+
+
+def test_histogram():
+    h = Histogram('t', maxlen=3)
+    for elapsed in [0.0005, 0.003, 0.003, 20]:
+        h.add('select ?', elapsed, 1)
+    d = h.to_dict()
+    assert d['statements'] == 3
+    x = d['by_fingerprint']['select ?']
+    assert x['count'] == 3 and x['buckets']['<=5ms'] == 2 and x['buckets']['<=infms'] == 1
+    assert x['buckets']['<=1ms'] == 0
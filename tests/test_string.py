@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: Seaky
+# @Date:   2026/10/18 18:30
+
+from datetime import datetime
+
+from seakylib.func.string import tsv_line
+
+
+def test_tsv_line():
+    assert tsv_line([1, 'a', None, True, False, 1.5]) == '1\ta\t\\N\t1\t0\t1.5\n'
+    assert tsv_line([datetime(2020, 1, 2, 3, 4, 5)]) == '2020-01-02 03:04:05\n'
+
+
+def test_tsv_line_escape():
+    assert tsv_line(['a\tb', 'c\nd', 'e\\f', 'g\rh', 'i\0j']) == 'a\\tb\tc\\nd\te\\\\f\tg\\rh\ti\\0j\n'
+    # the string "\N" is not NULL
+    assert tsv_line(['\\N', 'None', '']) == '\\\\N\tNone\t\n'
+    assert tsv_line([b'x\ty', '中文']) == 'x\\ty\t中文\n'